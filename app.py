@@ -1,4 +1,7 @@
-from flask import Flask, render_template_string, request, session, redirect, url_for
+from flask import Flask, render_template_string, request, session, redirect, url_for, make_response
+from collections import OrderedDict
+import hashlib
+import threading
 import random
 import math
 from capitals import CAPITALS, CAPITALS_AFRICA, CAPITALS_ASIA, CAPITALS_EUROPE, CAPITALS_NORTH_AMERICA, CAPITALS_SOUTH_AMERICA, CAPITALS_OCEANIA, FAMOUS_CITIES
@@ -11,6 +14,9 @@ app.secret_key = 'your_secret_key'  # Replace with a secure key in production
 ZOOM_LEVELS = [19, 18, 17, 15, 13, 11]  # 19: a few houses, 11: whole city
 MAX_ATTEMPTS = 6
 
+# Rendered pages kept in process, keyed by ETag, evicted least-recently-used first
+RENDER_CACHE_SIZE = 256
+
 HTML_TEMPLATE = '''
 <!doctype html>
 <title>Guess the City</title>
@@ -185,6 +191,60 @@ LIST_OPTIONS = {
     'Famous Cities': FAMOUS_CITIES,
 }
 
+CHOOSE_LIST_TEMPLATE = '''
+        <h2>Choose a City List</h2>
+        <form method="post">
+            <select name="list_choice">
+                {% for key in options.keys() %}
+                <option value="{{ key }}">{{ key }}</option>
+                {% endfor %}
+            </select>
+            <button type="submit">Start</button>
+        </form>
+        '''
+
+PICKLIST_TEMPLATE = CHOOSE_LIST_TEMPLATE + '''<form action="/" method="get"><button type="submit">Back to Game</button></form>
+        '''
+
+# Templates, game settings and city lists are part of every ETag so edits
+# invalidate clients and the render cache
+TEMPLATE_VERSION = hashlib.sha1(repr((
+    HTML_TEMPLATE, CHOOSE_LIST_TEMPLATE, PICKLIST_TEMPLATE,
+    MAX_ATTEMPTS, ZOOM_LEVELS, sorted(LIST_OPTIONS.items()),
+)).encode('utf-8')).hexdigest()[:12]
+
+render_cache = OrderedDict()
+render_cache_lock = threading.Lock()
+
+def make_etag(*parts):
+    # Strong ETag derived from everything that affects the rendered page
+    key = repr((TEMPLATE_VERSION,) + parts).encode('utf-8')
+    return hashlib.sha1(key).hexdigest()
+
+def cached_page(etag, render, cache_control):
+    # Answer If-None-Match without rendering, otherwise reuse or fill the render cache
+    # Weak comparison, as If-None-Match requires, so W/ tags from proxies still match
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        with render_cache_lock:
+            body = render_cache.get(etag)
+            if body is not None:
+                render_cache.move_to_end(etag)
+        if body is None:
+            body = render()
+            with render_cache_lock:
+                render_cache[etag] = body
+                render_cache.move_to_end(etag)
+                while len(render_cache) > RENDER_CACHE_SIZE:
+                    render_cache.popitem(last=False)
+        response = make_response(body)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    if cache_control.startswith('private'):
+        response.vary.add('Cookie')
+    return response
+
 # Helper to pick a random point within radius (in km) of a lat/lon
 def random_point_within_radius(lat, lon, radius_km):
     radius_deg = radius_km / 111  # Approximate conversion
@@ -234,17 +294,11 @@ def index():
     list_choice = session.get('list_choice')
     if not list_choice:
         # Show list selection form
-        return render_template_string('''
-        <h2>Choose a City List</h2>
-        <form method="post">
-            <select name="list_choice">
-                {% for key in options.keys() %}
-                <option value="{{ key }}">{{ key }}</option>
-                {% endfor %}
-            </select>
-            <button type="submit">Start</button>
-        </form>
-        ''', options=LIST_OPTIONS)
+        return cached_page(
+            make_etag('choose'),
+            lambda: render_template_string(CHOOSE_LIST_TEMPLATE, options=LIST_OPTIONS),
+            'private, no-cache',
+        )
 
     city_list = LIST_OPTIONS[list_choice]
     if 'capital' not in session:
@@ -304,20 +358,33 @@ def index():
 
     leaflet_zoom = zoom
     city_names = [c['name'] for c in city_list]
-    return render_template_string(
-        HTML_TEMPLATE,
-        attempt=attempt,
-        max_attempts=MAX_ATTEMPTS,
-        zoom=leaflet_zoom,
-        message=message,
-        finished=finished,
-        lat=rand_lat,
-        lon=rand_lon,
-        capital=city['name'],
-        list_choice=list_choice,
-        score=score,
-        city_names=city_names
-    )
+
+    def render():
+        return render_template_string(
+            HTML_TEMPLATE,
+            attempt=attempt,
+            max_attempts=MAX_ATTEMPTS,
+            zoom=leaflet_zoom,
+            message=message,
+            finished=finished,
+            lat=rand_lat,
+            lon=rand_lon,
+            capital=city['name'],
+            list_choice=list_choice,
+            score=score,
+            city_names=city_names
+        )
+
+    if request.method == 'POST':
+        # Guess results carry a one-off message: revalidate like round pages, but
+        # stay storable so back-navigation reshows them from history
+        response = make_response(render())
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+        return response
+    # A plain GET renders the same page until the player guesses again
+    etag = make_etag('round', list_choice, city['name'], rand_lat, rand_lon, attempt, finished, score)
+    return cached_page(etag, render, 'private, no-cache')
 
 @app.route('/reset')
 def reset():
@@ -333,18 +400,12 @@ def picklist():
         session['list_choice'] = request.form['list_choice']
         session['score'] = session.get('score', {})
         return redirect(url_for('index'))
-    return render_template_string('''
-        <h2>Choose a City List</h2>
-        <form method="post">
-            <select name="list_choice">
-                {% for key in options.keys() %}
-                <option value="{{ key }}">{{ key }}</option>
-                {% endfor %}
-            </select>
-            <button type="submit">Start</button>
-        </form>
-        <form action="/" method="get"><button type="submit">Back to Game</button></form>
-        ''', options=LIST_OPTIONS)
+    # Same page for every visitor, so shared caches may store it too
+    return cached_page(
+        make_etag('picklist'),
+        lambda: render_template_string(PICKLIST_TEMPLATE, options=LIST_OPTIONS),
+        'public, no-cache',
+    )
 
 if __name__ == "__main__":
     app.run(debug=True)